@@ -1,9 +1,17 @@
-import win32com.client
-import csv
-import random
+import multiprocessing
+import os
+import numpy as np
 import pandas as pd
 
-# Documentation: 
+try:
+    # DSS-Extensions (pip install dss_python) drives the engine through its C API
+    # and mirrors the COM object model, so it is used in place of COM when present.
+    from dss import DSS as dss_engine
+except ImportError:
+    dss_engine = None
+    import win32com.client
+
+# Documentation:
 """
 This module is used to generate data for the machine learning model.
 It uses the OpenDSS engine to run simulations and collect data.
@@ -14,8 +22,9 @@ THe operations are:
         i) Randomly select % of loads and generators user wants to modify
         ii) Randomly select loads and generators based on the % selected
         iii) Modify parameters of selected loads and generators randomly based on some threshold(-50% to 50%)
-    3. Run simulation and collect data
+    3. Run simulations and collect data (in parallel, one OpenDSS instance per CPU core)
     4. Store data to CSV
+If dss_python is installed it is used instead of the Windows-only OpenDSS COM server.
 """
 
 FILE_PATH = "'A:\CCNY\J_Fall_2023\SD2\OpenDSS\IEEE 30 Bus\Master.dss'"
@@ -25,15 +34,21 @@ FILE_PATH = "'A:\CCNY\J_Fall_2023\SD2\OpenDSS\IEEE 30 Bus\Master.dss'"
 
 MAX_ITER = 1000
 MAX_CONTROL_ITER = 100
+PROGRESS_EVERY = 25  # Print progress every N finished simulations
 
 
 def setup_opendss(dss_path):
     print(dss_path)
-    dssObj = win32com.client.Dispatch("OpenDSSEngine.DSS")
+    if dss_engine is not None:
+        dssObj = dss_engine
+    else:
+        # Dispatch picks up the makepy wrapper generated by generate_com_wrapper, so
+        # property access is early-bound instead of resolving every name through
+        # IDispatch. Property names are case-sensitive here.
+        dssObj = win32com.client.Dispatch("OpenDSSEngine.DSS")
 
     if not dssObj.Start(0):
-        print("DSS failed to start!")
-        exit()
+        raise RuntimeError("DSS failed to start!")
 
     dssText = dssObj.Text
     dssCircuit = dssObj.ActiveCircuit
@@ -45,83 +60,66 @@ def setup_opendss(dss_path):
     return dssObj, dssText, dssCircuit, dssSolution
 
 
-def modify_load_parameters(dssCircuit, load_name, kw_pct_change, kvar_pct_change):
-    load = dssCircuit.Loads
-    load.Name = load_name
+def generate_com_wrapper():
+    """
+    Generate (on first run) the makepy wrapper for the OpenDSS type library.
 
-    # Update kW if a percentage change was provided
-    if kw_pct_change is not None:
-        scaling_factor_kw = 1 + (kw_pct_change / 100)
-        load.kW *= scaling_factor_kw
+    Called once in the parent process before the workers start, so they don't race
+    to write the shared gen_py cache.
+    """
+    if dss_engine is None:
+        win32com.client.gencache.EnsureDispatch("OpenDSSEngine.DSS")
 
-    # Update kVAr if a percentage change was provided
-    if kvar_pct_change is not None:
-        scaling_factor_kvar = 1 + (kvar_pct_change / 100)
-        load.kvar *= scaling_factor_kvar
 
+def modify_load_parameters(loads, load_name, kw, kvar):
+    # New values are computed up front (see draw_modifications), so only property
+    # writes go to the engine (no read-modify-write).
+    # Setting kW switches the element to the kW/PF spec and rescales its kvar; kvar
+    # is then set explicitly to original kvar x its own factor. Earlier versions
+    # read the kvar back after that rescale, so the kvar features of training data
+    # generated before this change follow a different distribution and should not
+    # be mixed with new data.
+    loads.Name = load_name
+    loads.kW = kw
+    loads.kvar = kvar
 
-def modify_generator_parameters(dssCircuit, gen_name, kw_pct_change, kvar_pct_change):
-    gen = dssCircuit.Generators
-    gen.Name = gen_name
 
-    # Update kW if a percentage change was provided
-    if kw_pct_change is not None:
-        scaling_factor_kw = 1 + (kw_pct_change / 100)
-        gen.kW *= scaling_factor_kw
+def modify_generator_parameters(gens, gen_name, kw, kvar):
+    # Same kW-then-kvar order and kvar handling as modify_load_parameters
+    gens.Name = gen_name
+    gens.kW = kw
+    gens.kvar = kvar
 
-    # Update kVAr if a percentage change was provided
-    if kvar_pct_change is not None:
-        scaling_factor_kvar = 1 + (kvar_pct_change / 100)
-        gen.kvar *= scaling_factor_kvar
 
+def scaling_factors(rng, pct_range, size):
+    """Draw size random percentage changes from pct_range, returned as multipliers."""
+    return 1 + rng.uniform(pct_range[0], pct_range[1], size) / 100
 
-def solve_and_fetch_results(dssCircuit, dssText, dssSolution):
-    loads = dssCircuit.Loads
-    gens = dssCircuit.Generators
-    dssSolution.Solve()
 
-    if not dssSolution.Converged:
-        print("Solution did not Converge")
-        exit()
-
-    # Extract load data
-    load_data = {}
-    loads.First  # Set the first load as active
-    load_idx = dssCircuit.Loads.First
-    while load_idx > 0:
-        load_data[loads.Name] = {"kW": loads.kW, "kvar": loads.kvar}
-        load_idx = dssCircuit.Loads.Next
-
-    # Extract generator data
-    gen_data = {}
-    gens.First  # Set the first generator as active
-    gen_idx = dssCircuit.Generators.First
-    while gen_idx > 0:
-        gen_data[gens.Name] = {"kW": gens.kW, "kvar": gens.kvar}
-        gens.Next  # Move to the next generator
-        gen_idx = dssCircuit.Generators.Next
-
-    buses = dssCircuit.AllBusNames
-    voltages = dssCircuit.AllBusVmagPu
-
-    data = {
-        "Loads": load_data,
-        "Generators": gen_data,
-        "Voltages": dict(zip(buses, voltages)),
-    }
-    return data
+def draw_modifications(rng, original_kw, original_kvar, count, kw_range, kvar_range):
+    """
+    Pick count elements at random and compute their new kW/kvar values.
+
+    This is the purely numeric part of a simulation and makes no engine calls, so it
+    runs as a handful of NumPy operations regardless of the feeder size.
+
+    Returns:
+        Tuple: The positions of the chosen elements and their new kW and kvar arrays.
+    """
+    idx = rng.choice(len(original_kw), size=count, replace=False)
+    new_kw = original_kw[idx] * scaling_factors(rng, kw_range, count)
+    new_kvar = original_kvar[idx] * scaling_factors(rng, kvar_range, count)
+    return idx, new_kw, new_kvar
 
 
-def store_original_parameters(dssCircuit):
+def store_original_parameters(loads, gens):
     original_loads = {}
-    loads = dssCircuit.Loads
     i = loads.First
     while i > 0:
         original_loads[loads.Name] = {"kW": loads.kW, "kvar": loads.kvar}
         i = loads.Next
 
     original_gens = {}
-    gens = dssCircuit.Generators
     i = gens.First
     while i > 0:
         original_gens[gens.Name] = {"kW": gens.kW, "kvar": gens.kvar}
@@ -130,133 +128,273 @@ def store_original_parameters(dssCircuit):
     return original_loads, original_gens
 
 
-def reset_to_original_parameters(dssCircuit, original_loads, original_gens):
-    loads = dssCircuit.Loads
-    for load_name, params in original_loads.items():
+def reset_to_original_parameters(
+    loads, gens, original_loads, original_gens, load_names, gen_names
+):
+    """Restore the original kW/kvar of the given loads and generators only."""
+    for load_name in load_names:
+        params = original_loads[load_name]
         loads.Name = load_name
         loads.kW = params["kW"]
         loads.kvar = params["kvar"]
 
-    gens = dssCircuit.Generators
-    for gen_name, params in original_gens.items():
+    for gen_name in gen_names:
+        params = original_gens[gen_name]
         gens.Name = gen_name
         gens.kW = params["kW"]
         gens.kvar = params["kvar"]
 
 
-def collect_data_for_ml(dssCircuit, dssSolution):
+def training_columns(load_names, gen_names, node_names):
+    """Column names of a training sample, in the order collect_data_for_ml writes them."""
+    columns = []
+    for name in load_names:
+        columns += [f"load_{name}_kW", f"load_{name}_kvar"]
+    for name in gen_names:
+        columns += [f"gen_{name}_kW", f"gen_{name}_kvar"]
+    # AllBusVmagPu has one value per node ("bus.phase"), so there is one label per node
+    columns += [f"bus_{node}_Vpu" for node in node_names]
+    return columns
+
+
+def collect_data_for_ml(
+    dssCircuit, dssSolution, row, load_kw, load_kvar, gen_kw, gen_kvar
+):
+    """
+    Solve the circuit and write one training sample into row.
+
+    The kW/kvar arrays hold the values currently applied to each load and generator
+    (in First/Next walk order), so they do not have to be read back from the engine
+    one element at a time. Values are written by position in the layout given by
+    training_columns.
+
+    Returns:
+        bool: True if the solution converged and row was filled.
+    """
     # Solving the circuit
     dssSolution.Solve()
 
     if not dssSolution.Converged:
         print("Solution did not converge")
-        return None, None
-
-    # Extract data for machine learning
-    loads = dssCircuit.Loads
-    gens = dssCircuit.Generators
-    buses = dssCircuit.AllBusNames
-    voltages = dssCircuit.AllBusVmagPu
+        return False
 
-    # Initialize dictionaries to collect features and labels
-    features = {}
-    labels = {}
+    # Collect load and generator parameters as features (kW and kvar alternate)
+    n_loads = 2 * len(load_kw)
+    n_features = n_loads + 2 * len(gen_kw)
+    row[0:n_loads:2] = load_kw
+    row[1:n_loads:2] = load_kvar
+    row[n_loads:n_features:2] = gen_kw
+    row[n_loads + 1 : n_features : 2] = gen_kvar
 
-    # Collect load and generator parameters as features
-    idx = loads.First
-    while idx > 0:
-        features[f"load_{loads.Name}_kW"] = loads.kW
-        features[f"load_{loads.Name}_kvar"] = loads.kvar
-        idx = loads.Next
+    # Collect voltages as labels, one per node in AllNodeNames order
+    row[n_features:] = dssCircuit.AllBusVmagPu
 
-    idx = gens.First
-    while idx > 0:
-        features[f"gen_{gens.Name}_kW"] = gens.kW
-        features[f"gen_{gens.Name}_kvar"] = gens.kvar
-        idx = gens.Next
+    return True
 
-    # Collect voltages as labels
-    for bus, voltage in zip(buses, voltages):
-        labels[f"bus_{bus}_Vpu"] = voltage
 
-    return features, labels
+# OpenDSS handles and sampling settings owned by each worker process (see init_worker)
+worker_state = {}
 
 
-def store_to_csv(data, file_name):
-    with open(file_name, "w", newline="") as csvfile:
-        writer = csv.writer(csvfile)
-        for key, value in data.items():
-            writer.writerow([key])
-            for sub_key, sub_value in value.items():
-                writer.writerow([sub_key, sub_value])
+def init_worker(dss_path, settings):
+    """
+    Pool initializer: start a private OpenDSS instance for this worker process and
+    cache everything that stays the same across its simulations.
+    """
+    try:
+        dssObj, dssText, dssCircuit, dssSolution = setup_opendss(dss_path)
+    except RuntimeError as error:
+        # An exception escaping a pool initializer only makes the pool respawn the
+        # worker forever, so keep it and raise it from the worker's first task
+        worker_state["error"] = error
+        return
 
-    print("Data stored to CSV.")
+    # Cache the COM collection handles and element names once; every attribute
+    # lookup on dssCircuit is a round-trip through the COM dispatch layer.
+    loads = dssCircuit.Loads
+    gens = dssCircuit.Generators
+    original_loads, original_gens = store_original_parameters(loads, gens)
+    # Names in the order of the First/Next walk that read the originals. AllNames
+    # also lists disabled elements, which the walk skips, so it can't be used here.
+    load_names = list(original_loads)
+    gen_names = list(original_gens)
+
+    # Node order of AllBusVmagPu
+    node_names = list(dssCircuit.AllNodeNames)
+    columns = training_columns(load_names, gen_names, node_names)
+
+    total_loads = len(load_names)
+    total_generators = len(gen_names)
+
+    worker_state.update(
+        settings,
+        # Each worker gets its own generator, freshly seeded from the OS, so forked
+        # workers don't share (and repeat) the parent's random state.
+        rng=np.random.default_rng(),
+        dssCircuit=dssCircuit,
+        dssSolution=dssSolution,
+        loads=loads,
+        gens=gens,
+        load_names=load_names,
+        gen_names=gen_names,
+        original_loads=original_loads,
+        original_gens=original_gens,
+        # Original values as arrays in load_names/gen_names order
+        original_load_kw=np.array([original_loads[n]["kW"] for n in load_names]),
+        original_load_kvar=np.array([original_loads[n]["kvar"] for n in load_names]),
+        original_gen_kw=np.array([original_gens[n]["kW"] for n in gen_names]),
+        original_gen_kvar=np.array([original_gens[n]["kvar"] for n in gen_names]),
+        columns=columns,
+        # Positions of the elements changed by the previous simulation in this worker
+        modified_loads=set(),
+        modified_gens=set(),
+        number_of_loads_to_change=max(
+            1, int((settings["percentage_of_loads_to_change"] / 100) * total_loads)
+        ),
+        number_of_generators_to_change=max(
+            1,
+            int(
+                (settings["percentage_of_generators_to_change"] / 100)
+                * total_generators
+            ),
+        ),
+    )
 
 
-def main():
-    dssObj, dssText, dssCircuit, dssSolution = setup_opendss(FILE_PATH)
+def run_single_simulation(sim_index):
+    """
+    Run one randomized simulation in this worker's OpenDSS instance.
+
+    Returns:
+        tuple: The simulation index and the sample row (laid out as in
+        training_columns), or None in place of the row if the solution did not converge.
+    """
+    state = worker_state
+    if "error" in state:
+        raise state["error"]
+    loads = state["loads"]
+    gens = state["gens"]
+    original_loads = state["original_loads"]
+    original_gens = state["original_gens"]
+
+    rng = state["rng"]
+    load_names = state["load_names"]
+    gen_names = state["gen_names"]
+
+    # Select random loads and generators to modify, as positions in load_names and
+    # gen_names, and compute their new values
+    load_idx, new_load_kw, new_load_kvar = draw_modifications(
+        rng,
+        state["original_load_kw"],
+        state["original_load_kvar"],
+        state["number_of_loads_to_change"],
+        state["load_kw_range"],
+        state["load_kvar_range"],
+    )
+    gen_idx, new_gen_kw, new_gen_kvar = draw_modifications(
+        rng,
+        state["original_gen_kw"],
+        state["original_gen_kvar"],
+        state["number_of_generators_to_change"],
+        state["gen_kw_range"],
+        state["gen_kvar_range"],
+    )
+    selected_loads = load_idx.tolist()
+    selected_gens = gen_idx.tolist()
+
+    # Reset to original values only what the previous simulation changed and this
+    # one doesn't overwrite; everything else is still at its original value.
+    reset_to_original_parameters(
+        loads,
+        gens,
+        original_loads,
+        original_gens,
+        [load_names[i] for i in state["modified_loads"].difference(selected_loads)],
+        [gen_names[i] for i in state["modified_gens"].difference(selected_gens)],
+    )
+    state["modified_loads"] = set(selected_loads)
+    state["modified_gens"] = set(selected_gens)
+
+    # Apply the new values to the selected loads and generators
+    for i, kw, kvar in zip(
+        selected_loads, new_load_kw.tolist(), new_load_kvar.tolist()
+    ):
+        modify_load_parameters(loads, load_names[i], kw, kvar)
+
+    for i, kw, kvar in zip(selected_gens, new_gen_kw.tolist(), new_gen_kvar.tolist()):
+        modify_generator_parameters(gens, gen_names[i], kw, kvar)
+
+    # Values applied this run: the originals with the selected entries replaced
+    load_kw = state["original_load_kw"].copy()
+    load_kvar = state["original_load_kvar"].copy()
+    gen_kw = state["original_gen_kw"].copy()
+    gen_kvar = state["original_gen_kvar"].copy()
+    load_kw[load_idx] = new_load_kw
+    load_kvar[load_idx] = new_load_kvar
+    gen_kw[gen_idx] = new_gen_kw
+    gen_kvar[gen_idx] = new_gen_kvar
+
+    # Collect data
+    row = np.empty(len(state["columns"]), dtype=np.float64)
+    converged = collect_data_for_ml(
+        state["dssCircuit"],
+        state["dssSolution"],
+        row,
+        load_kw,
+        load_kvar,
+        gen_kw,
+        gen_kvar,
+    )
+    return sim_index, row if converged else None
 
-    number_of_simulations = 500
-    percentage_of_loads_to_change = 70  # e.g., 70 percent
-    percentage_of_generators_to_change = 30  # e.g., 30 percent
-    original_loads, original_gens = store_original_parameters(dssCircuit)
 
-    all_data = []
+def get_training_columns():
+    """Return the worker's training_columns layout (used via Pool.apply)."""
+    if "error" in worker_state:
+        raise worker_state["error"]
+    return worker_state["columns"]
 
-    # Define your randomization range for loads and generators
-    load_kw_range = (-50, 50)  # Percent change
-    load_kvar_range = (-10, 10)  # Percent change
-    gen_kw_range = (-50, 50)  # Actual change in kW
-    gen_kvar_range = (-10, 10)  # Actual change in kvar
 
-    total_loads = len(dssCircuit.Loads.AllNames)
-    total_generators = len(dssCircuit.Generators.AllNames)
+def main():
+    number_of_simulations = 500
 
-    number_of_loads_to_change = max(
-        1, int((percentage_of_loads_to_change / 100) * total_loads)
-    )
-    number_of_generators_to_change = max(
-        1, int((percentage_of_generators_to_change / 100) * total_generators)
-    )
+    settings = {
+        "percentage_of_loads_to_change": 70,  # e.g., 70 percent
+        "percentage_of_generators_to_change": 30,  # e.g., 30 percent
+        # Define your randomization range for loads and generators
+        "load_kw_range": (-50, 50),  # Percent change
+        "load_kvar_range": (-10, 10),  # Percent change
+        "gen_kw_range": (-50, 50),  # Actual change in kW
+        "gen_kvar_range": (-10, 10),  # Actual change in kvar
+    }
 
-    for i in range(number_of_simulations):
-        print(f"Running simulation {i+1}/{number_of_simulations}")
-
-        # Reset loads and generators to original values before each simulation
-        reset_to_original_parameters(dssCircuit, original_loads, original_gens)
-
-        # Select random loads and generators to modify
-        selected_loads = random.sample(
-            dssCircuit.Loads.AllNames, number_of_loads_to_change
-        )
-        selected_gens = random.sample(
-            dssCircuit.Generators.AllNames, number_of_generators_to_change
-        )
-
-        # Randomly modify parameters of selected loads
-        for load_name in selected_loads:
-            modify_load_parameters(
-                dssCircuit,
-                load_name,
-                kw_pct_change=random.uniform(*load_kw_range),
-                kvar_pct_change=random.uniform(*load_kvar_range),
-            )
-
-        # Randomly modify parameters of selected generators
-        for gen_name in selected_gens:
-            modify_generator_parameters(
-                dssCircuit,
-                gen_name,
-                kw_pct_change=random.uniform(*gen_kw_range),
-                kvar_pct_change=random.uniform(*gen_kvar_range),
-            )
-        # Collect data
-        features, labels = collect_data_for_ml(dssCircuit, dssSolution)
-        if features is not None:
-            all_data.append({**features, **labels})
+    generate_com_wrapper()
+
+    # The simulations are independent, so each worker process runs its own
+    # OpenDSS instance and they are spread across all cores.
+    with multiprocessing.Pool(
+        processes=os.cpu_count(),
+        initializer=init_worker,
+        initargs=(FILE_PATH, settings),
+    ) as pool:
+        columns = pool.apply(get_training_columns)
+
+        # Every sample has the same layout, so preallocate the whole matrix and
+        # fill it row by row instead of collecting one dict per simulation.
+        samples = np.empty((number_of_simulations, len(columns)), dtype=np.float64)
+        converged = np.zeros(number_of_simulations, dtype=bool)
+
+        for i, (sim_index, row) in enumerate(
+            pool.imap_unordered(run_single_simulation, range(number_of_simulations))
+        ):
+            if (i + 1) % PROGRESS_EVERY == 0 or i + 1 == number_of_simulations:
+                print(f"Finished simulation {i+1}/{number_of_simulations}")
+            if row is not None:
+                samples[sim_index] = row
+                converged[sim_index] = True
 
     # Create a Pandas DataFrame
-    df = pd.DataFrame(all_data)
+    df = pd.DataFrame(samples[converged], columns=columns)
 
     # Save DataFrame to CSV
     df.to_csv("training_data.csv", index=False)
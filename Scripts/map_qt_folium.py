@@ -20,12 +20,25 @@ Instructions To Run:
 
 """
 
+import csv
+import functools
+import hashlib
+import json
 import os
+import pickle
 import re
 import sys
-import win32com.client
-from PyQt5.QtCore import QUrl, QTimer, Qt
-from PyQt5.QtWebEngineWidgets import QWebEngineView
+from PyQt5.QtCore import (
+    QObject,
+    QSortFilterProxyModel,
+    QStringListModel,
+    QThread,
+    QUrl,
+    QTimer,
+    Qt,
+    pyqtSignal,
+    pyqtSlot,
+)
 from PyQt5.QtWidgets import (
     QApplication,
     QCheckBox,
@@ -46,10 +59,7 @@ from PyQt5.QtWidgets import (
     QDialog,
     QFormLayout,
 )
-import folium
 import math
-import random
-import pandas as pd
 import numpy as np
 
 # Absolute paths for the CSV files
@@ -61,6 +71,7 @@ import numpy as np
 # MODEL_NAME = "random_forest_model30.joblib"
 
 LINE_LOAD_VALUE = r"A:\CCNY\J_Fall_2023\SD2\OpenDSS\iee9500linesggdata.csv"  # Check GitHub Sample_Data folder.
+SAMPLE_XY_FILE = r"A:\CCNY\J_Fall_2023\SD2\OpenDSS\sample_for_x_y.txt"  # Check GitHub Sample_Data folder.
 MAP_HTML_FILE = "A:\\CCNY\\J_Fall_2023\\SD2\\OpenDSS\\map.html"
 
 if not os.path.exists(MAP_HTML_FILE):
@@ -77,6 +88,56 @@ cwd_before = os.getcwd()
 MAX_ITER = 1000
 MAX_CONTROL_ITER = 100
 
+# Integers in element names, used to sort them naturally
+NUMBER_PATTERN = re.compile(r"\d+")
+
+# Rendered HTML of the static map (lines, loads, generators, legend) and of the page
+# last written to MAP_HTML_FILE. Set by create_map and display_pu_feedback.
+base_map_html = None
+last_map_html = None
+
+# Draws the PU feedback circles in the browser from a JSON list of
+# [lat, lon, color, popup] entries, on top of the already rendered base map.
+PU_FEEDBACK_SCRIPT = """
+<script>
+(function () {
+    // The empty "PU Feedback" group of the base map, already listed in its
+    // LayerControl next to the other layers
+    var layer = %(layer)s;
+    // Draw the circles on one canvas instead of an SVG element each; the canvas
+    // only paints circles inside the view (plus half a screen of padding)
+    var renderer = L.canvas({padding: 0.5});
+    // Also called from Python to redraw the circles without reloading the page
+    window.updatePuFeedback = function (markers) {
+        layer.clearLayers();
+        markers.forEach(function (m) {
+            L.circle([m[0], m[1]], {
+                radius: 6, color: m[2], weight: 3, fill: false, renderer: renderer
+            })
+                .bindPopup(m[3])
+                .addTo(layer);
+        });
+        return true;
+    };
+    window.updatePuFeedback(%(markers)s);
+})();
+</script>
+"""
+
+# Creates a clustered circle marker from a [lat, lon, popup, tooltip] row; the
+# marker style is filled in with the options of the layer
+CIRCLE_MARKER_CALLBACK = """
+function (row) {
+    var marker = L.circleMarker(new L.LatLng(row[0], row[1]), %s);
+    marker.bindPopup(row[2], {maxWidth: 300});
+    marker.bindTooltip(row[3]);
+    return marker;
+}
+"""
+
+# Zoom level from which loads and generators are shown individually
+CLUSTER_MAX_ZOOM = 15
+
 
 def setup_opendss():
     """
@@ -85,6 +146,8 @@ def setup_opendss():
     Returns:
         Tuple: A tuple containing the OpenDSS objects.
     """
+    import win32com.client
+
     dssObj = win32com.client.Dispatch("OpenDSSEngine.DSS")
 
     # Start the DSS
@@ -102,45 +165,154 @@ def setup_opendss():
     return dssObj, dssText, dssCircuit, dssElement, dssSolution
 
 
-def calculate_line_loading(dssCircuit, dssText, dssSolution):
+def load_with_cache(path, parse):
     """
-    Calculate the line loading values for the circuit.
+    Parse an input file, reusing a pickled copy of the result while the file is unchanged.
+
+    The cache is written next to the input file as <path>.pkl and is rebuilt whenever
+    the input file is newer than it.
+
+    Args:
+        path (str): The path of the input file.
+        parse (function): A function that reads the file and returns the parsed data.
+
+    Returns:
+        The parsed data.
+    """
+    cache_path = f"{path}.pkl"
+    source_mtime = os.path.getmtime(path)
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= source_mtime:
+        with open(cache_path, "rb") as file:
+            return pickle.load(file)
+
+    data = parse(path)
+    try:
+        with open(cache_path, "wb") as file:
+            pickle.dump(data, file, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError:
+        # Read-only location, parse the file again next time
+        pass
+    return data
+
+
+def read_line_loading(path):
+    """
+    Read the line loading CSV file (line_name, line_value).
+
+    Args:
+        path (str): The path of the CSV file.
+
+    Returns:
+        dict: A dictionary with line names as keys and loading values as values.
+    """
+    # utf-8-sig drops the byte order mark in front of the header
+    with open(path, newline="", encoding="utf-8-sig") as file:
+        reader = csv.reader(file)
+        next(reader)  # Skip the header row
+        # Lines without a value are kept as NaN, as pandas would read them
+        return {row[0]: float(row[1] or "nan") for row in reader}
+
+
+def make_bus_coords(bus_names, bus_lats, bus_lons):
+    """
+    Build the bus coordinates table: one array per coordinate plus a name lookup.
+
+    Args:
+        bus_names (list): The bus names.
+        bus_lats (list): The latitude of each bus.
+        bus_lons (list): The longitude of each bus.
+
+    Returns:
+        dict: "index" maps each lowercase bus name to its position in the "lat" and
+        "lon" arrays.
+    """
+    return {
+        "index": {name.lower(): i for i, name in enumerate(bus_names)},
+        "lat": np.asarray(bus_lats, dtype=float),
+        "lon": np.asarray(bus_lons, dtype=float),
+    }
+
+
+def read_bus_coordinates(path):
+    """
+    Read the bus coordinates file (bus, lat, lon).
+
+    Args:
+        path (str): The path of the coordinates file.
+
+    Returns:
+        dict: The bus coordinates table, see make_bus_coords.
+    """
+    # Parse the whole file in one call; the coordinate columns are converted to
+    # float in bulk by make_bus_coords
+    table = np.loadtxt(path, delimiter=",", dtype=str, ndmin=2)
+    if table.size == 0:
+        return make_bus_coords([], [], [])
+    return make_bus_coords(table[:, 0].tolist(), table[:, 1], table[:, 2])
+
+
+def read_lines(dssCircuit, dssElement):
+    """
+    Read the buses and current rating of every line in a single walk over the lines.
 
     Args:
         dssCircuit (object): The OpenDSS circuit object.
-        dssText (object): The OpenDSS text object.
-        dssSolution (object): The OpenDSS solution object.
+        dssElement (object): The OpenDSS active circuit element object.
 
     Returns:
-        dict: A dictionary containing the line loading values for each line.
+        dict: A dictionary with line names as keys and their Bus1, Bus2 and NormAmps.
     """
-    dssLines = dssCircuit.Lines
-    dssMonitors = dssCircuit.Monitors
-    dssText.Command = "set mode = daily"
-    dssText.Command = "set Number = 1"
     line_values = {}
+    dssLines = dssCircuit.Lines
 
-    # Activate the first Line to start the iteration
-    iLine = dssLines.First
-    while iLine > 0:
-        # Get the current Line's name
-        line_name = dssLines.Name
-
-        # Using the Lines COM interface to get Bus1 and Bus2 names
-        bus1 = dssLines.Bus1
-        bus2 = dssLines.Bus2
+    # First/Next also makes each line the active circuit element, so
+    # dssElement.BusNames returns both of its bus connections in a single COM call.
+    # The name is read in the walk too, since First/Next skip disabled lines.
+    line_idx = dssLines.First
+    while line_idx > 0:
+        # Bus1 and Bus2 names of the active line
+        bus1, bus2 = dssElement.BusNames[:2]
 
-        # Initialize loading as None
-        line_values[line_name] = {
+        # Store the data in the dictionary
+        line_values[dssLines.Name] = {
             "Bus1": bus1,
             "Bus2": bus2,
-            "Loading": random.uniform(0, 100),
+            "NormAmps": dssLines.NormAmps,
         }
 
         # Move to the next Line object
-        iLine = dssLines.Next
+        line_idx = dssLines.Next
+
+    return line_values
+
+
+def calculate_line_loading(dssCircuit, dssText, dssSolution, line_values):
+    """
+    Calculate the line loading values for the circuit.
+
+    Args:
+        dssCircuit (object): The OpenDSS circuit object.
+        dssText (object): The OpenDSS text object.
+        dssSolution (object): The OpenDSS solution object.
+        line_values (dict): The lines of the circuit, as returned by read_lines.
+
+    Returns:
+        dict: A dictionary containing the line loading values for each line.
+    """
+    dssMonitors = dssCircuit.Monitors
+    dssText.Command = "set mode = daily"
+    dssText.Command = "set Number = 1"
+
+    # Initialize loading as None
+    line_values = {
+        line_name: dict(values, Loading=None)
+        for line_name, values in line_values.items()
+    }
 
     # Line Loading Calculation
+    monitored_lines = []
+    channels = []
+    norm_amps = []
     monitor_idx = dssMonitors.First
     while monitor_idx > 0:
         line_name = dssMonitors.Name.split(".")[
@@ -148,23 +320,36 @@ def calculate_line_loading(dssCircuit, dssText, dssSolution):
         ]  # Assuming monitor name format is 'Monitor.line_name'
         if line_name in line_values:
             dssMonitors.Name = f"line_{line_name}"
-            I1 = np.array(dssMonitors.Channel(7), dtype=float)  # Current Magnitude
-            I2 = np.array(dssMonitors.Channel(9), dtype=float)
-            I3 = np.array(dssMonitors.Channel(11), dtype=float)
+            # Current magnitude of each phase
+            channels.append(
+                (
+                    dssMonitors.Channel(7),
+                    dssMonitors.Channel(9),
+                    dssMonitors.Channel(11),
+                )
+            )
 
-            # Calculating the total current
-            total_current = np.sqrt(I1**2 + I2**2 + I3**2)
+            # Line's normal current rating
+            monitored_lines.append(line_name)
+            norm_amps.append(line_values[line_name]["NormAmps"])
 
-            # Get line's normal current rating
-            dssLines.Name = line_name
-            NormAmps = dssLines.NormAmps
+        monitor_idx = dssMonitors.Next
 
-            # Calculate the line loading
-            if NormAmps != 0:
-                line_loading = np.mean(total_current) * 100 / NormAmps
-                line_values[line_name]["Loading"] = random.uniform(0, 100)
+    if monitored_lines:
+        # Shape (monitors, phases, samples); every monitor covers the same run
+        currents = np.asarray(channels, dtype=float)
 
-        monitor_idx = dssMonitors.Next
+        # Total current per sample, averaged over the run, for all lines at once
+        total_current = np.sqrt(np.einsum("ijk,ijk->ik", currents, currents))
+        mean_current = total_current.mean(axis=1)
+
+        # Calculate the line loading, skipping lines without a rating
+        norm_amps = np.asarray(norm_amps, dtype=float)
+        rated = norm_amps != 0
+        line_loading = mean_current[rated] * 100 / norm_amps[rated]
+        rated_lines = [name for name, r in zip(monitored_lines, rated) if r]
+        for line_name, loading in zip(rated_lines, line_loading.tolist()):
+            line_values[line_name]["Loading"] = loading
 
     return line_values
 
@@ -177,38 +362,21 @@ def load_bus_data(dssCircuit, dssElement, dssText, dssSolution):
         Tuple: A tuple containing two dictionaries. The first dictionary contains bus values, and the second dictionary contains bus coordinates.
     """
     load_values = {}
-    bus_coords = {}
     generator_values = {}
-    line_values = {}
 
-    # ------------------------ LINES ------------------------#
-    dssLines = dssCircuit.Lines
+    # Each First/Next below also makes that element the active circuit element, so
+    # dssElement.BusNames returns all of its bus connections in a single COM call.
+    # Names are read inside the same walk: First/Next skip disabled elements while
+    # AllNames lists them, so zipping the two would shift names onto other elements.
 
-    # Activate the first Line to start the iteration
-    iLine = dssLines.First
-    while iLine > 0:
-        # Get the current Line's name
-        line_name = dssLines.Name
-
-        # Using the Lines COM interface to get Bus1 and Bus2 names
-        bus1 = dssLines.Bus1
-        bus2 = dssLines.Bus2
-
-        # Store the data in the dictionary
-        line_values[line_name] = {"Bus1": bus1, "Bus2": bus2}
-
-        # Move to the next Line object
-        iLine = dssLines.Next
+    # ------------------------ LINES ------------------------#
+    line_values = read_lines(dssCircuit, dssElement)
 
     # ------------------------ Line Loads ------------------------#
     os.chdir(cwd_before)
-    # Read the Excel file into a DataFrame
+    # Read the CSV file (line_name, line_value) into a dictionary, parsed once
     try:
-        df = pd.read_csv(LINE_LOAD_VALUE)
-        # Convert the DataFrame to a dictionary with line_name as keys and line_value as values
-        line_loading_values = pd.Series(
-            df.line_value.values, index=df.line_name
-        ).to_dict()
+        line_loading_values = load_with_cache(LINE_LOAD_VALUE, read_line_loading)
 
         # Merge line loading values into line_values
         for line_name, loading in line_loading_values.items():
@@ -228,17 +396,16 @@ def load_bus_data(dssCircuit, dssElement, dssText, dssSolution):
         # Handle the error or exit
 
     # ------------------------ LOADS ------------------------#
+    dssLoads = dssCircuit.Loads
 
-    i = dssCircuit.Loads.First
-    while i:
-        load_name = dssCircuit.Loads.Name
-        # Set dssElement to the active load
-        dssCircuit.SetActiveElement(load_name)
-        # Fetch the bus to which the load is connected using dssElement
-        bus1 = dssCircuit.ActiveElement.Properties("Bus1").Val
-        kv = dssCircuit.Loads.kV  # This fetches the base kV for the load
-        kw = dssCircuit.Loads.kW
-        kvar = dssCircuit.Loads.kvar
+    load_idx = dssLoads.First
+    while load_idx > 0:
+        load_name = dssLoads.Name
+        # Fetch the bus to which the active load is connected
+        bus1 = dssElement.BusNames[0]
+        kv = dssLoads.kV  # This fetches the base kV for the load
+        kw = dssLoads.kW
+        kvar = dssLoads.kvar
 
         # Store the values in the dictionary
         load_values[load_name] = {
@@ -249,32 +416,21 @@ def load_bus_data(dssCircuit, dssElement, dssText, dssSolution):
         }
 
         # Move to the next load
-        i = dssCircuit.Loads.Next
+        load_idx = dssLoads.Next
 
     # ------------------------ BUS COORDINATES ------------------------#
-    coordinates_missing = False
-    for i in range(dssCircuit.NumBuses):
-        bus = dssCircuit.Buses(i)
-        if bus.x != 0 or bus.y != 0:
-            bus_name = bus.Name.lower()
-            bus_coords[bus_name] = {"lat": bus.y, "lon": bus.x}
-        else:
-            coordinates_missing = True
-            # print(f"No coordinates found for bus: {bus.Name}")
-            break
-
-    if coordinates_missing:
-        # Coordinates are missing, read from the CSV file
+    # OpenDSS writes the coordinates of every bus (name, x, y) with one command,
+    # instead of reading x and y bus by bus; buses without coordinates are left out
+    dssText.Command = "export buscoords"
+    bus_coords = read_bus_coordinates(dssText.Result)
+    # The export lists x (longitude) before y (latitude), the coordinates file the
+    # other way round
+    bus_coords["lat"], bus_coords["lon"] = bus_coords["lon"], bus_coords["lat"]
+
+    if len(bus_coords["index"]) < dssCircuit.NumBuses:
+        # Coordinates are missing, read from the CSV file, parsed once
         try:
-            with open(f"{SAMPLE_XY_FILE}", "r") as file:
-                lines = file.readlines()
-                for line in lines:
-                    sline = line.split(",")
-                    bus_name = sline[0].lower()
-                    bus_coords[bus_name] = {
-                        "lat": float(sline[1]),
-                        "lon": float(sline[2]),
-                    }
+            bus_coords = load_with_cache(SAMPLE_XY_FILE, read_bus_coordinates)
         except FileNotFoundError:
             print(
                 f"The file {SAMPLE_XY_FILE} was not found. Please check the file path and name."
@@ -284,12 +440,10 @@ def load_bus_data(dssCircuit, dssElement, dssText, dssSolution):
     dssGenerators = dssCircuit.Generators
 
     # Activate the first generator to start the iteration
-    iGen = dssGenerators.First
-    while iGen > 0:
-        # Get the current generator's name
+    gen_idx = dssGenerators.First
+    while gen_idx > 0:
         genName = dssGenerators.Name
-
-        bus_val = dssElement.Properties("Bus1").val.lower()
+        bus_val = dssElement.BusNames[0].lower()
 
         # Retrieve the properties of the current generator
         generator_values[genName] = {
@@ -298,13 +452,13 @@ def load_bus_data(dssCircuit, dssElement, dssText, dssSolution):
             "kW": dssGenerators.kW,
             "kvar": dssGenerators.kvar,
             "Model": dssGenerators.Model,
-            "Vpu": dssElement.Properties("Vpu").val,
-            "Maxkvar": dssElement.Properties("Maxkvar").val,
-            "Minkvar": dssElement.Properties("Minkvar").val,
+            "Vpu": dssElement.Properties("Vpu").Val,
+            "Maxkvar": dssElement.Properties("Maxkvar").Val,
+            "Minkvar": dssElement.Properties("Minkvar").Val,
         }
 
         # Move to the next generator
-        iGen = dssGenerators.Next
+        gen_idx = dssGenerators.Next
 
     # Assuming dssCircuit, dssElement are already defined and imported from OpenDSS
 
@@ -314,11 +468,9 @@ def load_bus_data(dssCircuit, dssElement, dssText, dssSolution):
     transformer_values = {}
 
     # Activate the first transformer to start the iteration
-    iTrans = dssTransformers.First
-    while iTrans > 0:
-        # Get the current transformer's name
+    trans_idx = dssTransformers.First
+    while trans_idx > 0:
         transName = dssTransformers.Name
-
         # Retrieve the properties of the current transformer
         transformer_values[transName] = {
             "Wdg": dssTransformers.NumWindings,
@@ -327,60 +479,101 @@ def load_bus_data(dssCircuit, dssElement, dssText, dssSolution):
             "Xhl": dssTransformers.Xhl,
             "Xht": dssTransformers.Xht,
             "Xlt": dssTransformers.Xlt,
-            "Buses": dssElement.Properties("Buses").val,
-            "Conn": dssElement.Properties("Conn").val,
+            "Buses": dssElement.BusNames,
+            "Conn": dssElement.Properties("Conn").Val,
             # Add other relevant properties here
         }
 
         # Move to the next transformer
-        iTrans = dssTransformers.Next
+        trans_idx = dssTransformers.Next
 
     return load_values, bus_coords, generator_values, line_values, transformer_values
 
 
-def add_pu_feedback_layer(m, bus_coords, given_voltages, threshold=(0.95, 1.05)):
+def pu_feedback_markers(bus_coords, node_names, given_voltages, threshold=(0.95, 1.05)):
     """
-    Add a layer on the map to represent the PU values of each bus.
+    Build the marker data that represents the PU value of each bus.
 
     Args:
-        m (folium.Map): The map object to which the layer is to be added.
-        bus_coords (dict): A dictionary containing bus coordinates.
-        voltages (dict): A dictionary containing the PU values of the buses.
+        bus_coords (dict): The bus coordinates table, see make_bus_coords.
+        node_names (list): The node names ("bus.phase") in the order of given_voltages.
+        given_voltages (list): The PU values of the bus nodes.
         threshold (tuple): A tuple with the lower and upper bounds for a good PU value.
 
     Returns:
-        folium.Map: The map object with the PU feedback layer added.
+        list: A [lat, lon, color, popup] row for every bus shown.
     """
-    # Create a feature group for PU feedback
-    pu_feedback_layer = folium.FeatureGroup(name="PU Feedback")
-    interval = 0
-    # Iterate over bus_coords to create markers
-    for bus_name, coord in bus_coords.items():
-        # Get the PU value for the bus
-        pu_value = given_voltages[interval + 3 % len(given_voltages)]
-        if pu_value:
-            # Determine the color based on the PU value
-            color = "green" if threshold[0] <= pu_value <= threshold[1] else "red"
-
-            # color = "green" if random.randint(0, 1) == 0 else "red"
-            # Create a marker with the appropriate color
-            hollow_circle = folium.Circle(
-                location=[coord["lat"], coord["lon"]],
-                radius=6,  # Define the radius of the circle
-                color=color,
-                weight=3,  # Define how thick the circle's border should be
-                fill=False,  # Set fill to False to create a hollow circle
-                popup=f"Bus: {bus_name}<br>PU: {pu_value:.3f}",
-            )
-            pu_feedback_layer.add_child(hollow_circle)
-            interval += 1
-    # Add the layer to the map
-    m.add_child(pu_feedback_layer)
+    # There is one PU value per node, so group the nodes by bus and keep the
+    # lowest and highest value of each bus
+    voltages = np.asarray(given_voltages, dtype=float)
+    bus_names, node_bus = group_nodes_by_bus(tuple(node_names))
+    pu_min = np.full(len(bus_names), np.inf)
+    pu_max = np.full(len(bus_names), -np.inf)
+    np.minimum.at(pu_min, node_bus, voltages)
+    np.maximum.at(pu_max, node_bus, voltages)
+
+    # Determine the color of all buses at once: a bus is good when every one of
+    # its nodes is within the threshold
+    good = (pu_min >= threshold[0]) & (pu_max <= threshold[1])
+    colors = np.where(good, "green", "red")
+    # Show the node value that is furthest from 1.0 PU
+    pu_values = np.where(1.0 - pu_min > pu_max - 1.0, pu_min, pu_max)
+
+    # Skip buses without coordinates and de-energized buses
+    coord_idx = np.array(
+        [bus_coords["index"].get(name, -1) for name in bus_names], dtype=int
+    )
+    shown = (coord_idx >= 0) & (pu_values != 0)
+    coord_idx = coord_idx[shown]
+
+    # Hollow circle with the appropriate color for every bus shown
+    return [
+        [lat, lon, color, f"Bus: {bus_name}<br>PU: {pu_value:.3f}"]
+        for lat, lon, color, bus_name, pu_value in zip(
+            bus_coords["lat"][coord_idx].tolist(),
+            bus_coords["lon"][coord_idx].tolist(),
+            colors[shown].tolist(),
+            bus_names[shown].tolist(),
+            pu_values[shown].tolist(),
+        )
+    ]
 
-    # Add a LayerControl to toggle this layer
-    m.add_child(folium.LayerControl())
 
-    return m
+def overlay_pu_feedback(base_html, layer_name, markers):
+    """
+    Add a layer on the rendered base map to represent the PU values of each bus.
+
+    Only the marker data is added here; the circles are created client-side,
+    so the static part of the map is not rendered again for every simulation.
+
+    Args:
+        base_html (str): The rendered HTML of the base map.
+        layer_name (str): The JavaScript name of the PU feedback layer in base_html.
+        markers (list): The marker rows, see pu_feedback_markers.
+
+    Returns:
+        str: The HTML of the map with the PU feedback layer added.
+    """
+    # Fill the layer from a script appended after the map script
+    script = PU_FEEDBACK_SCRIPT % {"layer": layer_name, "markers": json.dumps(markers)}
+    return base_html.replace("</html>", script + "</html>")
+
+
+@functools.lru_cache(maxsize=1)
+def group_nodes_by_bus(node_names):
+    """
+    Group the circuit nodes by bus. The node names do not change between
+    simulations, so this is only worked out once.
+
+    Args:
+        node_names (tuple): The node names ("bus.phase").
+
+    Returns:
+        tuple: The sorted lowercase bus names, and the position of each node's bus
+        in them.
+    """
+    node_buses = [get_base_bus_name(name.lower()) for name in node_names]
+    return np.unique(node_buses, return_inverse=True)
 
 
 # Helper function to strip phase notations from bus names
@@ -394,11 +587,7 @@ def get_base_bus_name(bus_name_with_phases):
     Returns:
         str: The base bus name without phase notations.
     """
-    return (
-        (bus_name_with_phases.split(".")[0])
-        if "." in bus_name_with_phases
-        else bus_name_with_phases
-    )
+    return bus_name_with_phases.partition(".")[0]
 
 
 def add_custom_legend(m):
@@ -428,63 +617,161 @@ def add_custom_legend(m):
 def create_map(
     load_values, bus_coords, generator_values, line_values, voltages, transformer_values
 ):
-    all_lats = []
-    all_lons = []
+    """
+    Render the base map and save it as MAP_HTML_FILE.
+
+    The render is cached in <MAP_HTML_FILE>.pkl and reused as long as the circuit
+    data (and this script) are unchanged, so folium is not even imported then.
+
+    Returns:
+        str: The JavaScript name of the PU feedback layer in the page.
+    """
+    global base_map_html, last_map_html
+
+    cache_path = f"{MAP_HTML_FILE}.pkl"
+    cache_key = hashlib.blake2b(
+        pickle.dumps(
+            (
+                os.path.getmtime(__file__),
+                load_values,
+                bus_coords,
+                generator_values,
+                line_values,
+                transformer_values,
+            ),
+            protocol=pickle.HIGHEST_PROTOCOL,
+        )
+    ).hexdigest()
+    try:
+        with open(cache_path, "rb") as file:
+            cached = pickle.load(file)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        cached = None
+
+    if cached is not None and cached["key"] == cache_key:
+        layer_name = cached["layer_name"]
+        base_map_html = cached["html"]
+    else:
+        m, layer_name = render_map(
+            load_values, bus_coords, generator_values, line_values, transformer_values
+        )
+        # Render the static scene once; simulations only append the PU feedback
+        # layer to this HTML
+        base_map_html = m.get_root().render()
+        try:
+            with open(cache_path, "wb") as file:
+                pickle.dump(
+                    {"key": cache_key, "layer_name": layer_name, "html": base_map_html},
+                    file,
+                    protocol=pickle.HIGHEST_PROTOCOL,
+                )
+        except OSError:
+            # Read-only location, render the map again next time
+            pass
+
+    # Save the base map as an HTML file
+    with open(MAP_HTML_FILE, "w", encoding="utf-8") as f:
+        f.write(base_map_html)
+    last_map_html = base_map_html
+
+    return layer_name
+
+
+def render_map(
+    load_values, bus_coords, generator_values, line_values, transformer_values
+):
+    """
+    Build the folium map with the lines, loads, generators and legend.
+
+    Returns:
+        tuple: The folium.Map object and the JavaScript name of its (empty) PU
+        feedback layer.
+    """
+    import folium
+    from folium.plugins import FastMarkerCluster
 
-    # Assuming MAP_HTML_FILE is defined elsewhere in your script
-    MAP_HTML_FILE = "map.html"
+    # Position of each bus in the coordinate arrays, and the coordinates as plain
+    # floats for building the markers
+    bus_index = bus_coords["index"]
+    lats = bus_coords["lat"].tolist()
+    lons = bus_coords["lon"].tolist()
+    load_buses = []
 
     # Initialize map at the first bus coordinates
-    first_bus_coords = next(iter(bus_coords.values()))
     m = folium.Map(
-        location=[first_bus_coords["lat"], first_bus_coords["lon"]],
+        location=[lats[0], lons[0]],
         zoom_start=10,
+        # Draw lines and circle markers on a canvas, which skips everything
+        # outside the view, instead of adding a DOM element per feature
+        prefer_canvas=True,
     )
 
-    # For Transmission Lines
-    for line, values in line_values.items():
-        bus1_base_name = get_base_bus_name(values["Bus1"])
-        bus2_base_name = get_base_bus_name(values["Bus2"])
+    # Map every bus reference once to the lowercase base name used by bus_index
+    bus_refs = {values["Bus1"] for values in line_values.values()}
+    bus_refs.update(values["Bus2"] for values in line_values.values())
+    bus_refs.update(values["bus"] for values in load_values.values())
+    bus_refs.update(values["Bus1"] for values in generator_values.values())
+    bus_refs.update(values["Buses"][0] for values in transformer_values.values())
+    base_names = {name: get_base_bus_name(name.lower()) for name in bus_refs}
+
+    # Color of every line from its loading: grey when unknown, green below 80%,
+    # yellow below 100% and red above
+    loadings = [values.get("Loading", "nan") for values in line_values.values()]
+    loadings = np.array(
+        [x if isinstance(x, (int, float)) else np.nan for x in loadings], dtype=float
+    )
+    line_colors = np.select(
+        [np.isnan(loadings), loadings < 80, loadings < 100],
+        ["grey", "green", "yellow"],
+        default="red",
+    ).tolist()
+
+    # For Transmission Lines, collected into one GeoJSON layer
+    line_features = []
+    for (line, values), line_color in zip(line_values.items(), line_colors):
+        bus1_base_name = base_names[values["Bus1"]]
+        bus2_base_name = base_names[values["Bus2"]]
 
         popup_content = (
             f"<div style='font-size: 14px'>"
             f"<div>Line --> To       -       From </div>"
             f"<div> 1) {values['Bus1']} - {values['Bus2']}<br></div>"
-            f"<div> 2) Line Loading: <strong>{values['Loading']}%</strong></div>"
+            f"<div> 2) Line Loading: <strong>{values.get('Loading', 'nan')}%</strong></div>"
             f"</div>"
         )
 
-        if bus1_base_name in bus_coords and bus2_base_name in bus_coords:
-            bus1_coord = bus_coords[bus1_base_name]
-            bus2_coord = bus_coords[bus2_base_name]
-            line_coords = [
-                (bus1_coord["lat"], bus1_coord["lon"]),
-                (bus2_coord["lat"], bus2_coord["lon"]),
-            ]
-            folium.PolyLine(
-                line_coords,
-                popup=folium.Popup(popup_content, max_width=300),
-                # is values['Loading'] is below 80 then green, between 81-99 then yellow, above 100 then red, if its a string then grey
-                # is values['Loading'] is below 80 then green, between 81-99 then yellow, above 100 then red, if its a string then grey
-                color="grey"
-                if values["Loading"] == "nan"
-                else "green"
-                if values["Loading"] < 80
-                else "yellow"
-                if values["Loading"] < 100
-                else "red",
-            ).add_to(m)
+        if bus1_base_name in bus_index and bus2_base_name in bus_index:
+            i = bus_index[bus1_base_name]
+            j = bus_index[bus2_base_name]
+            # GeoJSON coordinates are (lon, lat)
+            line_coords = [[lons[i], lats[i]], [lons[j], lats[j]]]
+            line_features.append(
+                {
+                    "type": "Feature",
+                    "geometry": {"type": "LineString", "coordinates": line_coords},
+                    "properties": {"popup": popup_content, "color": line_color},
+                }
+            )
         else:
             print(
                 f"Coordinates for buses {bus1_base_name} or {bus2_base_name} not found."
             )
 
-    # For Buses (Loads)
+    # A single layer for all lines, rendered by Leaflet in one pass
+    folium.GeoJson(
+        {"type": "FeatureCollection", "features": line_features},
+        name="Lines",
+        style_function=lambda feature: {"color": feature["properties"]["color"]},
+        popup=folium.GeoJsonPopup(fields=["popup"], labels=False, max_width=300),
+    ).add_to(m)
+
+    # For Buses (Loads), drawn as one clustered layer
+    load_rows = []
     for load_name, values in load_values.items():
-        # Convert bus to lowercase for matching with bus_coords keys
-        bus_name = get_base_bus_name(values["bus"].lower())
+        # Base name in lowercase for matching with bus_index keys
+        bus_name = base_names[values["bus"]]
 
-        coord = bus_coords[bus_name]
+        i = bus_index[bus_name]
         popup_content = (
             f"<div style='font-size: 14px'>"
             f"<strong style='color: blue'>Bus Name: {load_name}</strong><br>"
@@ -497,35 +784,39 @@ def create_map(
         )
 
         # marker = folium.Marker(
-        #     [coord["lat"], coord["lon"]],
+        #     [lats[i], lons[i]],
         #     icon=folium.Icon(prefix="fa", icon="lightbulb", color="blue"),
         #     popup=folium.Popup(popup_content, max_width=300),
         #     tooltip=load_name,
         # )
 
-        marker = folium.CircleMarker(
-            location=[coord["lat"], coord["lon"]],
-            radius=5,  # Small, non-obtrusive point
-            color="blue",
-            fill=True,
-            fill_color="blue",
-            weight=1,
-            fill_opacity=0.6,
-            tooltip=load_name,
-            popup=folium.Popup(popup_content, max_width=300),
-        )
-        m.add_child(marker)
-
-        all_lats.append(coord["lat"])
-        all_lons.append(coord["lon"])
-
-    # For Generators
+        load_rows.append([lats[i], lons[i], popup_content, load_name])
+        load_buses.append(i)
+
+    load_marker_style = {
+        "radius": 5,  # Small, non-obtrusive point
+        "color": "blue",
+        "fill": True,
+        "fillColor": "blue",
+        "weight": 1,
+        "fillOpacity": 0.6,
+    }
+    FastMarkerCluster(
+        load_rows,
+        callback=CIRCLE_MARKER_CALLBACK % json.dumps(load_marker_style),
+        name="Loads",
+        chunkedLoading=True,
+        disableClusteringAtZoom=CLUSTER_MAX_ZOOM,
+    ).add_to(m)
+
+    # For Generators, drawn as one clustered layer
+    generator_rows = []
     for gen, values in generator_values.items():
-        # Use the helper function to get the base name without phases
-        bus_base_name = get_base_bus_name(values["Bus1"])
+        # Look up the base name without phases
+        bus_base_name = base_names[values["Bus1"]]
 
-        # Check if the base name exists in the coordinates dictionary
-        coord = bus_coords[bus_base_name]
+        # Position of the bus in the coordinate arrays
+        i = bus_index[bus_base_name]
         popup_content = (
             f"<div style='font-size: 14px'>"
             f"<strong style='color: red'>Generator Name: {gen}</strong><br>"
@@ -538,7 +829,7 @@ def create_map(
         )
 
         # marker = folium.Marker(
-        #     [coord["lat"], coord["lon"]],
+        #     [lats[i], lons[i]],
         #     popup=folium.Popup(popup_content, max_width=300),
         #     tooltip=gen,
         #     icon=folium.Icon(
@@ -546,32 +837,34 @@ def create_map(
         #     ),  # Different icon for generators
         # )
 
-        marker = folium.CircleMarker(
-            location=[coord["lat"], coord["lon"]],
-            radius=5,  # Small, non-obtrusive point
-            popup=folium.Popup(popup_content, max_width=300),
-            color="orange",
-            fill=True,
-            fill_color="orange",
-            fill_opacity=0.7,
-            tooltip=gen,
-        )
-
-        m.add_child(marker)
+        generator_rows.append([lats[i], lons[i], popup_content, gen])
+
+    generator_marker_style = {
+        "radius": 5,  # Small, non-obtrusive point
+        "color": "orange",
+        "fill": True,
+        "fillColor": "orange",
+        "fillOpacity": 0.7,
+    }
+    FastMarkerCluster(
+        generator_rows,
+        callback=CIRCLE_MARKER_CALLBACK % json.dumps(generator_marker_style),
+        name="Generators",
+        chunkedLoading=True,
+        disableClusteringAtZoom=CLUSTER_MAX_ZOOM,
+    ).add_to(m)
 
     # For Transformers
     for trans, values in transformer_values.items():
-        # Use the helper function to get the base name without phases
+        # Look up the base name without phases
         # Assuming transformers also have a 'Buses' property that lists connected buses
 
-        # Clean the 'Buses' string to remove unwanted characters
-        buses_str = values["Buses"].strip("[] ")
-        first_bus = buses_str.split(",")[0]  # Taking the first bus for the location
-        bus_base_name = get_base_bus_name(first_bus)
+        first_bus = values["Buses"][0]  # Taking the first bus for the location
+        bus_base_name = base_names[first_bus]
 
-        # Check if the base name exists in the coordinates dictionary
-        if bus_base_name in bus_coords:
-            coord = bus_coords[bus_base_name]
+        # Check if the base name exists in the coordinates table
+        if bus_base_name in bus_index:
+            i = bus_index[bus_base_name]
             popup_content = (
                 f"<div style='font-size: 14px'>"
                 f"<strong style='color: blue'>Transformer Name: {trans}</strong><br>"
@@ -585,7 +878,7 @@ def create_map(
 
             # Using a different marker for transformers
             marker = folium.CircleMarker(
-                location=[coord["lat"], coord["lon"]],
+                location=[lats[i], lons[i]],
                 radius=5,  # Small, non-obtrusive point
                 popup=folium.Popup(popup_content, max_width=300),
                 color="purple",  # Different color for transformers
@@ -597,23 +890,27 @@ def create_map(
 
         # m.add_child(marker)
 
-    # Adjusting map bounds
-    sw = [min(all_lats), min(all_lons)]
-    ne = [max(all_lats), max(all_lons)]
+    # Adjusting map bounds to the loads
+    load_lats = bus_coords["lat"][load_buses]
+    load_lons = bus_coords["lon"][load_buses]
+    sw = [load_lats.min(), load_lons.min()]
+    ne = [load_lats.max(), load_lons.max()]
     m.fit_bounds([sw, ne])
 
+    # Empty layer for the PU feedback circles, which PU_FEEDBACK_SCRIPT fills in
+    # client-side; added before the LayerControl so it is toggled with the others
+    pu_layer = folium.FeatureGroup(name="PU Feedback").add_to(m)
+    m.add_child(folium.LayerControl())
+
     # Add custom legend
     add_custom_legend(m)
 
-    # Save the map as an HTML file
-    m.save(MAP_HTML_FILE)
-
-    return m
+    return m, pu_layer.get_name()
 
 
 def extract_numbers(s):
     """Extract all integers from a string and return them as a tuple using regular expression"""
-    return tuple(map(int, re.findall(r"\d+", s)))
+    return tuple(map(int, NUMBER_PATTERN.findall(s)))
 
 
 def custom_sort(item):
@@ -621,28 +918,42 @@ def custom_sort(item):
     return extract_numbers(item)
 
 
-def run_simulation(load_values, generator_values, changed_loads, map_obj):
+@functools.lru_cache(maxsize=4096)
+def format_power(value):
+    """Formats a kW/kvar value for display; revisited loads reuse the cached text."""
+    return "{:.2f}".format(value)
+
+
+def run_simulation(dssCircuit, dssText, dssSolution, changed_loads):
     """
-    Run a simulation with the given bus values.
+    Run a simulation with the given load changes.
 
     Args:
-        load_values (dict): A dictionary containing bus values.
+        dssCircuit (object): The OpenDSS circuit object.
+        dssText (object): The OpenDSS text object.
+        dssSolution (object): The OpenDSS solution object.
+        changed_loads (dict): A dictionary containing the new values of the changed loads.
 
     Returns:
-        None
+        list: The PU voltages of all bus nodes after the solve.
     """
-    # Apply changes to the loads in OpenDSS
+    # Apply changes to the loads in OpenDSS, one Edit command per load instead of
+    # separate COM calls to select the load and set each value
     for load_name, values in changed_loads.items():
         # Assuming load_name corresponds to the name of the load in OpenDSS
-        dssCircuit.Loads.Name = load_name
-
+        edits = []
         if "kw" in values:
-            dssCircuit.Loads.kW = values["kw"]
+            edits.append(f"kW={values['kw']}")
         if "kvar" in values:
-            dssCircuit.Loads.kvar = values["kvar"]
+            edits.append(f"kvar={values['kvar']}")
+
+        if edits:
+            dssText.Command = f"Edit Load.{load_name} {' '.join(edits)}"
 
-    # Now, solve the circuit with the new values
-    dssSolution.Solve()
+    # Now, solve the circuit with the new values. The circuit stays compiled in the
+    # engine between runs and only the load changes above are sent, so a snapshot
+    # solve of the current state is all that is needed
+    dssSolution.SolveSnap()
 
     # Check if the solution converged and print the result
     if dssSolution.Converged:
@@ -650,20 +961,59 @@ def run_simulation(load_values, generator_values, changed_loads, map_obj):
     else:
         print(f"Solution did not converge.")
 
-    new_voltages = dssCircuit.AllBusVmagPu
+    return dssCircuit.AllBusVmagPu
+
+
+def display_pu_feedback(new_voltages, layer_name):
+    """
+    Show the PU values of a simulation on the map.
+
+    Args:
+        new_voltages (list): The PU voltages of all bus nodes.
+        layer_name (str): The JavaScript name of the PU feedback layer, see create_map.
+
+    Returns:
+        None
+    """
+    global last_map_html
 
     # ---------------------------------- Display Back --------------------------------------- #
-    # # # Then, create your map and add the PU feedback layer
-    map_obj = add_pu_feedback_layer(map_obj, bus_coords, new_voltages)
+    # # # Then, add the PU feedback layer to the cached base map
+    markers = pu_feedback_markers(bus_coords, node_names, new_voltages)
+    map_html = overlay_pu_feedback(base_map_html, layer_name, markers)
 
-    # # Save the map as an HTML file (this is assumed to be a global constant)
-    map_obj.save(MAP_HTML_FILE)
+    # Nothing changed on the map, keep the page that is already displayed
+    if map_html == last_map_html:
+        return
 
-    # # Trigger the refresh of the map view in your GUI
-    refresh_map_view()
+    layer_shown = last_map_html != base_map_html
+    last_map_html = map_html
 
-    # For now, just print the values
-    # print(load_values)
+    # # Once the page has the PU feedback layer, only its circles are redrawn and
+    # # the HTML file is left alone; the first time the map is saved and reloaded
+    if layer_shown:
+        update_pu_feedback_view(markers)
+    else:
+        save_and_refresh_map_view()
+
+
+def update_pu_feedback_view(markers):
+    """
+    Redraw the PU feedback circles in the loaded page, reloading it if it has no layer.
+    """
+    view.page().runJavaScript(
+        "window.updatePuFeedback ? updatePuFeedback(%s) : false" % json.dumps(markers),
+        lambda updated: updated or save_and_refresh_map_view(),
+    )
+
+
+def save_and_refresh_map_view():
+    """
+    Save the latest map HTML as MAP_HTML_FILE and reload the map view from it.
+    """
+    with open(MAP_HTML_FILE, "w", encoding="utf-8") as f:
+        f.write(last_map_html)
+    refresh_map_view()
 
 
 def refresh_map_view():
@@ -674,18 +1024,70 @@ def refresh_map_view():
     view.load(QUrl.fromLocalFile(os.path.abspath(MAP_HTML_FILE)))
 
 
+class SimulationWorker(QObject):
+    """
+    Runs the OpenDSS solve on a background thread so the UI stays responsive.
+    """
+
+    finished = pyqtSignal(object)
+
+    def __init__(self):
+        super().__init__()
+        self.dssCircuit = None
+        self.dssText = None
+        self.dssSolution = None
+
+    @pyqtSlot(object)
+    def run(self, changed_loads):
+        # finished is always emitted, with None on failure, so the editor can
+        # re-enable its submit button
+        new_voltages = None
+        try:
+            if self.dssCircuit is None:
+                # COM objects can only be used on the thread that created them, so
+                # this thread gets its own handles on the already compiled circuit
+                import pythoncom
+                import win32com.client
+
+                pythoncom.CoInitialize()
+                dssObj = win32com.client.Dispatch("OpenDSSEngine.DSS")
+                self.dssCircuit = dssObj.ActiveCircuit
+                self.dssText = dssObj.Text
+                self.dssSolution = self.dssCircuit.Solution
+
+            new_voltages = run_simulation(
+                self.dssCircuit, self.dssText, self.dssSolution, changed_loads
+            )
+        except Exception as e:
+            print(f"Simulation failed: {e}")
+        finally:
+            self.finished.emit(new_voltages)
+
+
 class BusEditor(QWidget):
     """
     A widget for editing bus values and running simulations.
     """
 
-    def __init__(self, load_values, generator_values, message_label, map_obj):
+    simulation_requested = pyqtSignal(object)
+
+    def __init__(self, load_values, generator_values, message_label, layer_name):
         super().__init__()
 
         self.load_values = load_values
         self.generator_values = generator_values
         self.message_label = message_label
+        self.layer_name = layer_name
         self.temp_changes = {}  # Temporarily store changes before simulation
+
+        # kW/kvar of all loads as arrays, in load_values order, so global
+        # adjustments scale every load in one operation
+        self.load_names = list(load_values)
+        self.load_index = {load: i for i, load in enumerate(self.load_names)}
+        self.load_kw = np.array([v["kw"] for v in load_values.values()], dtype=float)
+        self.load_kvar = np.array(
+            [v["kvar"] for v in load_values.values()], dtype=float
+        )
         self.layout = QVBoxLayout()
 
         # -------------------------------- Search -------------------------------------------- #
@@ -701,8 +1103,30 @@ class BusEditor(QWidget):
         search_layout.addWidget(label)
 
         self.search_box = QLineEdit(self)
-        self.completer = QCompleter(list(self.load_values.keys()), self)
+        # One list of load names backs both the dropdown and the completer
+        sorted_loads = sorted(load_values.keys(), key=custom_sort)
+        self.load_name_model = QStringListModel(sorted_loads, self)
+        # The completer sees the names sorted case-insensitively through a proxy
+        # (an index mapping, not a copy), so it can binary-search them instead of
+        # scanning every load on each keystroke
+        self.completer_model = QSortFilterProxyModel(self)
+        self.completer_model.setSourceModel(self.load_name_model)
+        self.completer_model.setSortCaseSensitivity(Qt.CaseInsensitive)
+        self.completer_model.sort(0)
+        self.completer = QCompleter(self.completer_model, self)
+        self.completer.setCaseSensitivity(Qt.CaseInsensitive)
+        self.completer.setModelSorting(QCompleter.CaseInsensitivelySortedModel)
+        self.completer.setFilterMode(Qt.MatchStartsWith)
+        self.completer.setMaxVisibleItems(10)
+        self.completer.activated[str].connect(self.on_load_selected_from_completer)
         self.search_box.setCompleter(self.completer)
+
+        # Select the typed load once typing pauses, not on every keystroke
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(200)
+        self.search_timer.timeout.connect(self.on_load_selected)
+        self.search_box.textEdited.connect(lambda text: self.search_timer.start())
         self.search_box.setPlaceholderText("Type to search...")
         self.search_box.setSizePolicy(
             QSizePolicy.Preferred, QSizePolicy.Fixed
@@ -715,9 +1139,12 @@ class BusEditor(QWidget):
         # -------------------------------- Dropdown ------------------------------------------ #
         # Create dropdown field for load
         self.load_search = QComboBox(self)
-        sorted_loads = sorted(load_values.keys(), key=custom_sort)
-        self.load_search.addItems(sorted_loads)
-        self.load_search.currentIndexChanged.connect(self.populate_values)
+        self.load_search.setModel(self.load_name_model)
+        self.load_search_index = {load: i for i, load in enumerate(sorted_loads)}
+        # Remember the selected load and its values, so handlers skip the Qt calls
+        self.current_load = self.load_search.currentText()
+        self.current_values = load_values[self.current_load]
+        self.load_search.currentTextChanged.connect(self.on_load_changed)
         self.layout.addWidget(QLabel("Select Load:"))
         self.layout.addWidget(self.load_search)
 
@@ -810,6 +1237,8 @@ class BusEditor(QWidget):
 
         self.add_pv_btn.clicked.connect(self.show_pv_dialog)
         self.layout.addWidget(self.add_pv_btn)
+        # Built once and reset on every click
+        self.pv_dialog = PvSystemDialog(self)
 
         # ---------------------------------- Run Simulation --------------------------------------- #
         # Submit button to run simulation
@@ -818,46 +1247,50 @@ class BusEditor(QWidget):
         self.submit_btn.clicked.connect(self.run_simulation)
         self.layout.addWidget(self.submit_btn)
 
+        # Solves run on a worker thread and report back through a signal
+        self.simulation_thread = QThread(self)
+        self.simulation_worker = SimulationWorker()
+        self.simulation_worker.moveToThread(self.simulation_thread)
+        self.simulation_requested.connect(self.simulation_worker.run)
+        self.simulation_worker.finished.connect(self.on_simulation_finished)
+        QApplication.instance().aboutToQuit.connect(self.stop_simulation_thread)
+        self.simulation_thread.start()
+
         self.setLayout(self.layout)
         self.populate_values()  # populate initial values
 
+    def on_load_changed(self, load):
+        self.current_load = load
+        self.current_values = self.load_values[load]
+        self.populate_values()
+
     def populate_values(self):
-        load = self.load_search.currentText()
-        values = self.load_values[load]
-        self.kw_label.setText("{:.2f}".format(values["kw"]))
-        self.kvar_label.setText("{:.2f}".format(values["kvar"]))
+        load = self.current_load
+        values = self.current_values
+        # Keep the exact values; the labels only show them rounded
+        self.current_kw = values["kw"]
+        self.current_kvar = values["kvar"]
+        self.kw_label.setText(format_power(self.current_kw))
+        self.kvar_label.setText(format_power(self.current_kvar))
 
         # Update the selected load display
         self.selected_load_display.setText(load)
 
     def on_load_selected(self):
-        load = self.search_box.text()
-        if load in self.load_values:
-            values = self.load_values[load]
-            self.kw_input.setText(str(values["kw"]))
-            self.kvar_input.setText(str(values["kvar"]))
+        self.on_load_selected_from_completer(self.search_box.text())
 
     def on_load_selected_from_completer(self, selected_load):
-        if selected_load in self.load_values:
-            # Set the dropdown to the selected load
-            index = self.load_search.findText(selected_load)
-            if index != -1:
-                self.load_search.setCurrentIndex(index)
-
-            values = self.load_values[selected_load]
-            self.kw_input.setText(str(values["kw"]))
-            self.kvar_input.setText(str(values["kvar"]))
+        self.search_timer.stop()
+        if selected_load in self.load_search_index:
+            # Set the dropdown to the selected load, which populates its values
+            self.load_search.setCurrentIndex(self.load_search_index[selected_load])
 
     def submit_changes(self):
-        load = self.load_search.currentText()
+        load = self.current_load
 
         # Calculate new values based on percentage
-        kw_new_val = float(self.kw_label.text()) + (
-            float(self.kw_label.text()) * (self.kw_percent.value() / 100)
-        )
-        kvar_new_val = float(self.kvar_label.text()) + (
-            float(self.kvar_label.text()) * (self.kvar_percent.value() / 100)
-        )
+        kw_new_val = self.current_kw * (1 + self.kw_percent.value() / 100)
+        kvar_new_val = self.current_kvar * (1 + self.kvar_percent.value() / 100)
 
         self.temp_changes[load] = {
             "kw": kw_new_val,
@@ -885,19 +1318,19 @@ class BusEditor(QWidget):
 
     def apply_global_adjustment(self):
         adjustment_percentage = self.global_percentage_spinbox.value() / 100
-        # Initialize a temporary dictionary to store changes
-
-        for load, values in self.load_values.items():
-            # Create a new dictionary to store the adjusted values
-            adjusted_values = values.copy()
-
-            if self.kw_checkbox.isChecked():
-                adjusted_values["kw"] *= 1 + adjustment_percentage
-            if self.kvar_checkbox.isChecked():
-                adjusted_values["kvar"] *= 1 + adjustment_percentage
+        factor = 1 + adjustment_percentage
+
+        # Adjust all loads at once
+        new_kw = self.load_kw * factor if self.kw_checkbox.isChecked() else self.load_kw
+        new_kvar = (
+            self.load_kvar * factor
+            if self.kvar_checkbox.isChecked()
+            else self.load_kvar
+        )
 
-            # Store the adjusted values in the temp_changes dictionary
-            self.temp_changes[load] = adjusted_values
+        # Store the adjusted values in the temp_changes dictionary
+        for load, kw, kvar in zip(self.load_names, new_kw.tolist(), new_kvar.tolist()):
+            self.temp_changes[load] = {"kw": kw, "kvar": kvar}
 
         self.show_temporary_message(
             f"Values adjusted by {adjustment_percentage*100}% globally!"
@@ -905,8 +1338,9 @@ class BusEditor(QWidget):
         self.populate_values()  # Refresh the displayed values for the currently selected load
 
     def show_pv_dialog(self):
-        load_selected = self.load_search.currentText()
-        dialog = PvSystemDialog(self)
+        load_selected = self.current_load
+        dialog = self.pv_dialog
+        dialog.reset(load_selected)
         if dialog.exec_():
             # get the values from the dialog
             name_of_pv = dialog.name_of_pv_input.text()
@@ -925,18 +1359,29 @@ class BusEditor(QWidget):
             # dssText.command = 'New PVSystem.' + ... (use your logic to construct the command)
 
     def run_simulation(self):
-        # Apply changes to load_values
+        # Apply changes to load_values (keeping bus and kv) and the kW/kvar arrays
         for load, values in self.temp_changes.items():
-            self.load_values[load] = values
+            self.load_values[load].update(values)
+            i = self.load_index[load]
+            self.load_kw[i] = values["kw"]
+            self.load_kvar[i] = values["kvar"]
 
-        # Call your existing run_simulation method
-        run_simulation(
-            self.load_values, self.generator_values, self.temp_changes, map_obj
-        )
+        # Solve on the worker thread; the button stays disabled until it is done
+        self.submit_btn.setEnabled(False)
+        self.simulation_requested.emit(self.temp_changes)
 
-        # Clear temp_changes after running the simulation
+        # Clear temp_changes after starting the simulation
         self.temp_changes = {}
 
+    def on_simulation_finished(self, new_voltages):
+        if new_voltages is not None:
+            display_pu_feedback(new_voltages, self.layer_name)
+        self.submit_btn.setEnabled(True)
+
+    def stop_simulation_thread(self):
+        self.simulation_thread.quit()
+        self.simulation_thread.wait()
+
 
 class PvSystemDialog(QDialog):
     def __init__(self, parent=None):
@@ -954,12 +1399,11 @@ class PvSystemDialog(QDialog):
         self.pmpp_input = QLineEdit(self)
         self.irrad_input = QLineEdit(self)
 
-        selec_load_display = QLabel(self)
-        selec_load_display.setStyleSheet("color: red; font-weight: bold;")
-        selec_load_display.setText(f"Selected Load: {parent.load_search.currentText()}")
+        self.selec_load_display = QLabel(self)
+        self.selec_load_display.setStyleSheet("color: red; font-weight: bold;")
 
         # Add widgets to form layout
-        form_layout.addRow(selec_load_display)
+        form_layout.addRow(self.selec_load_display)
         form_layout.addRow("Name of PV:", self.name_of_pv_input)
         form_layout.addRow("Phases:", self.phases_input)
         form_layout.addRow("kVA:", self.kva_input)
@@ -974,11 +1418,25 @@ class PvSystemDialog(QDialog):
 
         self.setLayout(form_layout)
 
+    def reset(self, load):
+        """Clears the inputs of the previous PV system and shows the selected load."""
+        self.selec_load_display.setText(f"Selected Load: {load}")
+        for line_edit in (
+            self.name_of_pv_input,
+            self.kva_input,
+            self.kv_input,
+            self.pmpp_input,
+            self.irrad_input,
+        ):
+            line_edit.clear()
+        self.phases_input.setValue(1)
+
 
 if __name__ == "__main__":
     dssObj, dssText, dssCircuit, dssElement, dssSolution = setup_opendss()
     os.chdir(cwd_before)
     voltages = dssCircuit.AllBusVmagPu
+    node_names = dssCircuit.AllNodeNames  # Node order of AllBusVmagPu
     (
         load_values,
         bus_coords,
@@ -986,7 +1444,7 @@ if __name__ == "__main__":
         line_values,
         transformer_values,
     ) = load_bus_data(dssCircuit, dssElement, dssText, dssSolution)
-    map_obj = create_map(
+    layer_name = create_map(
         load_values,
         bus_coords,
         generator_values,
@@ -995,6 +1453,10 @@ if __name__ == "__main__":
         transformer_values,
     )
 
+    # Imported only when the GUI is started; QtWebEngineWidgets has to be imported
+    # before the QApplication is created
+    from PyQt5.QtWebEngineWidgets import QWebEngineView
+
     # PyQt5 app
     app = QApplication(sys.argv)
 
@@ -1012,15 +1474,15 @@ if __name__ == "__main__":
 
     # Create QWebEngineView
     view = QWebEngineView(main)
-    view.load(QUrl.fromLocalFile(os.path.abspath(MAP_HTML_FILE)))
     main.setCentralWidget(view)
 
     # Add bus editor as a docked panel
-    bus_editor = BusEditor(load_values, generator_values, message_label, map_obj)
+    bus_editor = BusEditor(load_values, generator_values, message_label, layer_name)
     dock = QDockWidget("Bus Editor", main)
     dock.setWidget(bus_editor)
     main.addDockWidget(Qt.RightDockWidgetArea, dock)
 
-    # Show window
+    # Show window, and load the map once the window and bus editor have painted
     main.show()
+    QTimer.singleShot(0, refresh_map_view)
     sys.exit(app.exec_())
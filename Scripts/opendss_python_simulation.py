@@ -17,6 +17,7 @@ Then, follow the instructions on the screen to modify the simulation.
 
 import win32com.client
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 
@@ -26,6 +27,10 @@ FILE_PATH = "'A:\Softwares\OpenDSS\IEEETestCases\IEEE 30 Bus\Master.dss'"
 #     "'C:\\Users\\dip2l\\Downloads\\ieee9500dss\\ieee9500dss\\ieee9500_base _copy.dss'"
 # )
 
+# Above this many nodes the voltage comparison plots a min/max envelope instead of
+# every point (e.g. the IEEE 9500 circuit)
+MAX_PLOT_POINTS = 2000
+
 
 def setup_opendss():
     dssObj = win32com.client.Dispatch("OpenDSSEngine.DSS")
@@ -36,27 +41,24 @@ def setup_opendss():
         exit()
 
     dssText = dssObj.Text
+    # Compile the circuit once; later runs only edit and re-solve it
+    dssText.Command = f"compile {FILE_PATH}"
     dssCircuit = dssObj.ActiveCircuit
 
     return dssObj, dssText, dssCircuit
 
 
 def run_simulation(dssText, dssCircuit):
+    dssCircuit.Solution.Solve()
     dssText.Command = "export voltages IEEE_30_VLN_Node_Initial.Txt"
-    dssText.Command = f"compile {FILE_PATH}"
-    dssText.Command = "solve"
 
     voltages = dssCircuit.AllBusVmagPu
     return voltages
 
 
 def list_load_names(dssCircuit):
-    load_names = []
-    i = dssCircuit.Loads.First
-    while i:
-        load_names.append(dssCircuit.Loads.Name)
-        i = dssCircuit.Loads.Next
-    return load_names
+    """Returns a list of load names from the OpenDSS circuit."""
+    return list(dssCircuit.Loads.AllNames)
 
 
 def list_line_names(dssCircuit):
@@ -70,32 +72,55 @@ def list_transformer_names(dssCircuit):
 
 
 def get_load_details(dssCircuit):
+    dssLoads = dssCircuit.Loads
     load_names = []
     load_kw = []
     load_kvar = []
 
-    i = dssCircuit.Loads.First
+    # Names are read in the same walk as the values: First/Next skip disabled loads,
+    # which AllNames still lists
+    i = dssLoads.First
     while i:
-        load_names.append(dssCircuit.Loads.Name)
-        load_kw.append(dssCircuit.Loads.kW)
-        load_kvar.append(dssCircuit.Loads.kvar)
-        i = dssCircuit.Loads.Next
+        load_names.append(dssLoads.Name)
+        load_kw.append(dssLoads.kW)
+        load_kvar.append(dssLoads.kvar)
+        i = dssLoads.Next
 
     return load_names, load_kw, load_kvar
 
 
+def read_change_factor(prompt):
+    """Asks for a percentage change until a number is given and returns it as a scale factor."""
+    while True:
+        try:
+            percentage = float(input(prompt))
+        except ValueError:
+            print("Please enter a number, e.g. 10 or -5.5")
+            continue
+        return 1 + percentage / 100  # e.g. 10% -> 1.1
+
+
+def read_load_name(prompt, load_names):
+    """Asks for a load name until a known one is given (any case) and returns it."""
+    names_by_key = {name.lower(): name for name in load_names}
+    while True:
+        name = input(prompt).strip().lower()
+        if name in names_by_key:
+            return names_by_key[name]
+        print(f"Load {name} not found, please pick one of the available loads.")
+
+
 def change_one_load(dssCircuit, dssSolution):
     print("Available loads: ", list_load_names(dssCircuit))
     bus = input("Which bus load would you like to change?")
-    factor = int(input("How much would you like to change the load?"))
-    factor = (1 + factor) / 100
+    factor = read_change_factor("How much would you like to change the load?(%)")
 
     dssCircuit.Loads.Name = bus  # set active load to the bus specified by the user
     load_properties = dssCircuit.Loads  # get load properties for the active load
-    load_kw = load_properties.kw
+    load_kw = load_properties.kW
     load_kvar = load_properties.kvar
 
-    dssCircuit.Loads.kw = load_kw * factor  # update real power of the active load
+    dssCircuit.Loads.kW = load_kw * factor  # update real power of the active load
     dssCircuit.Loads.kvar = (
         load_kvar * factor
     )  # update the reactive power of the active load
@@ -103,58 +128,53 @@ def change_one_load(dssCircuit, dssSolution):
 
 
 # Changing multiple loads
-newer_kw = []
-newer_kvar = []
-
-
 def change_multiple_loads(dssCircuit, dssSolution):
-    factor = int(input("How much would you like to change all of the loads?(%)"))
-    factor = (1 + factor) / 100
+    factor = read_change_factor(
+        "How much would you like to change all of the loads?(%)"
+    )
 
-    load_idx = dssCircuit.Loads.First  # get the index of the first load in the circuit
+    dssLoads = dssCircuit.Loads
+    load_idx = dssLoads.First  # activate the first load in the circuit
     while load_idx > 0:
-        load_name = dssCircuit.Loads.Name  # get the name of the current load
-        dssCircuit.Loads.Name = load_name  # set the active load to the current load
-        load_properties = dssCircuit.Loads  # get load properties for the active load
-
-        load_kw = load_properties.kw  # get real power for the active load
-        dssCircuit.Loads.kw = load_kw * factor  # updating real power of the active load
-
-        load_kvar = load_properties.kvar  # get the reactive power of the active load
-        dssCircuit.Loads.kvar = (
+        # Read both values before writing; setting kW alone can rescale kvar. Both
+        # are scaled by the same factor, so a load defined by power factor keeps
+        # its power factor (reading kvar after the kW write scaled it by factor^2)
+        load_kw = dssLoads.kW  # get real power for the active load
+        load_kvar = dssLoads.kvar  # get the reactive power of the active load
+
+        dssLoads.kW = load_kw * factor  # updating real power of the active load
+        dssLoads.kvar = (
             load_kvar * factor
         )  # updating the reactive power of the active load
 
-        newer_kw.append(dssCircuit.Loads.kw)
-        newer_kvar.append(dssCircuit.Loads.kvar)
-
-        load_idx = dssCircuit.Loads.Next
+        load_idx = dssLoads.Next
 
-        # print(dssCircuit.Loads.kvar)
-        # print(f"\n")
     dssSolution.Solve()
 
 
 #
-def change_multiple_specific_loads(dssCircuit, dssSolution):
-    print("Available loads: ", list_load_names(dssCircuit))
+def change_multiple_specific_loads(dssCircuit, dssText, dssSolution):
+    load_names = list_load_names(dssCircuit)
+    print("Available loads: ", load_names)
     num_loads = int(input("How many loads would you like to change?"))
 
+    # Ask for all changes first, so the circuit is only edited once every input is valid
+    changes = []
     for load in range(num_loads):
-        bus = input("Which bus load would you like to change? ")
-        factor = int(input("How much would you like to change the load?"))
-        factor = (1 + factor) / 100
-        dssCircuit.Loads.Name = bus  # set the active load to the user specified bus
-        load_properties = dssCircuit.Loads  # get load properties for active load
-        load_kw = load_properties.kw  # get the real power of the active load
-        load_kvar = load_properties.kvar  # get the reactive power of the active load
-
-        dssCircuit.Loads.kw = (
-            load_kw * factor
-        )  # update the real power of the active load
-        dssCircuit.Loads.kvar = (
-            load_kvar * factor
-        )  # update the reactive power of the active load
+        bus = read_load_name("Which bus load would you like to change? ", load_names)
+        factor = read_change_factor("How much would you like to change the load?(%)")
+        changes.append((bus, factor))
+
+    dssLoads = dssCircuit.Loads
+    for bus, factor in changes:
+        dssLoads.Name = bus  # set the active load to the user specified bus
+        load_kw = dssLoads.kW  # get the real power of the active load
+        load_kvar = dssLoads.kvar  # get the reactive power of the active load
+
+        # Write both values with one Edit command instead of two property sets
+        dssText.Command = (
+            f"Edit Load.{bus} kW={load_kw * factor} kvar={load_kvar * factor}"
+        )
 
     dssSolution.Solve()
 
@@ -181,11 +201,57 @@ def plot_data(voltages, loads):
     plt.show()
 
 
+def downsample_voltages(voltages, max_points=MAX_PLOT_POINTS):
+    """
+    Splits the voltages into at most max_points bins of consecutive nodes.
+
+    Args:
+        voltages: Voltage magnitudes (p.u.), one per node.
+        max_points: Maximum number of bins.
+
+    Returns:
+        tuple: The bin edges (first node index of each bin, then the node count),
+        and the minimum and maximum voltage of each bin. The last minimum and
+        maximum are repeated at the final edge, so a step="post" plot also
+        covers the width of the last bin.
+    """
+    voltages = np.asarray(voltages, dtype=float)
+    bin_size = -(-len(voltages) // max_points)  # round up
+    starts = np.arange(0, len(voltages), bin_size)
+    low = np.minimum.reduceat(voltages, starts)
+    high = np.maximum.reduceat(voltages, starts)
+    return (
+        np.append(starts, len(voltages)),
+        np.append(low, low[-1]),
+        np.append(high, high[-1]),
+    )
+
+
 def graph_compare_voltages(initial_voltages, modified_voltages):
     # Compare initial and modified voltages
     plt.figure(figsize=(12, 6))
-    plt.plot(initial_voltages, label="Initial Voltages", marker="o")
-    plt.plot(modified_voltages, label="Modified Voltages", marker="x", linestyle="--")
+    if len(initial_voltages) > MAX_PLOT_POINTS:
+        # Too many nodes to draw a marker each; plot the min/max envelope per bin
+        for voltages, label in (
+            (initial_voltages, "Initial Voltages"),
+            (modified_voltages, "Modified Voltages"),
+        ):
+            x, low, high = downsample_voltages(voltages)
+            plt.fill_between(
+                x, low, high, step="post", alpha=0.5, label=label, rasterized=True
+            )
+    else:
+        # rasterized keeps saved figures from storing every segment as a vector
+        plt.plot(
+            initial_voltages, label="Initial Voltages", marker="o", rasterized=True
+        )
+        plt.plot(
+            modified_voltages,
+            label="Modified Voltages",
+            marker="x",
+            linestyle="--",
+            rasterized=True,
+        )
     plt.title("Bus Voltages (p.u.) for IEEE 30-bus system")
     plt.ylabel("Voltage (p.u.)")
     plt.xlabel("Bus Index")
@@ -198,11 +264,12 @@ def graph_compare_voltages(initial_voltages, modified_voltages):
 def graph_compare_voltages_interactive(initial_voltages, modified_voltages):
     fig = go.Figure()
 
+    # Scattergl draws with WebGL, which stays responsive with thousands of nodes
     fig.add_trace(
-        go.Scatter(y=initial_voltages, mode="lines+markers", name="Initial Voltages")
+        go.Scattergl(y=initial_voltages, mode="lines+markers", name="Initial Voltages")
     )
     fig.add_trace(
-        go.Scatter(
+        go.Scattergl(
             y=modified_voltages,
             mode="lines+markers",
             name="Modified Voltages",
@@ -222,11 +289,13 @@ def graph_compare_voltages_interactive(initial_voltages, modified_voltages):
 
 def apply_multiple_line_outages(dssCircuit, dssText, dssSolution):
     """Applies outages to user-specified lines."""
-    print("Available lines: ", list_line_names(dssCircuit))
+    available_lines = list_line_names(dssCircuit)
+    print("Available lines: ", available_lines)
+    available_lines = set(available_lines)
     line_names = input("Enter line names to outage (comma separated): ").split(",")
 
     for line_name in line_names:
-        if line_name.strip() in list_line_names(dssCircuit):
+        if line_name.strip() in available_lines:
             dssText.Command = f"disable Line.{line_name.strip()}"
         else:
             print(f"Warning: Line {line_name} not found.")
@@ -236,13 +305,15 @@ def apply_multiple_line_outages(dssCircuit, dssText, dssSolution):
 
 def apply_multiple_transformer_outages(dssCircuit, dssText, dssSolution):
     """Applies outages to user-specified transformers."""
-    print("Available transformers: ", list_transformer_names(dssCircuit))
+    available_transformers = list_transformer_names(dssCircuit)
+    print("Available transformers: ", available_transformers)
+    available_transformers = set(available_transformers)
     transformer_names = input(
         "Enter transformer names to outage (comma separated): "
     ).split(",")
 
     for transformer_name in transformer_names:
-        if transformer_name.strip() in list_transformer_names(dssCircuit):
+        if transformer_name.strip() in available_transformers:
             dssText.Command = f"disable Transformer.{transformer_name.strip()}"
         else:
             print(f"Warning: Transformer {transformer_name} not found.")
@@ -286,7 +357,7 @@ def main():
     elif choice == 2:
         change_multiple_loads(dssCircuit, dssSolution)
     elif choice == 3:
-        change_multiple_specific_loads(dssCircuit, dssSolution)
+        change_multiple_specific_loads(dssCircuit, dssText, dssSolution)
     elif choice == 4:
         apply_multiple_line_outages(dssCircuit, dssText, dssSolution)
     elif choice == 5: